@@ -2,8 +2,116 @@
 Formatting rules enforcement for BrandTone.
 """
 
+import heapq
 import re
-from typing import Dict, List, Tuple, Any
+from functools import partial
+from itertools import chain
+from random import getrandbits
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+
+try:
+    import regex as _regex
+except ImportError:  # Sentence rules fall back to the standard library
+    _regex = None
+
+# Rules whose matches cover whole sentences and are scanned on their own
+SENTENCE_RULES = frozenset({"long_sentences"})
+
+# Sentence pattern. Matches may only start at the beginning of the text or
+# right after a terminator, so a long run without one is scanned once rather
+# than once per starting position. With the regex package, the possessive
+# quantifier also never gives back characters while looking for the
+# terminator; stdlib re only accepts it from Python 3.11, so the fallback
+# uses a plain quantifier, which the lookbehind already keeps linear
+if _regex is not None:
+    LONG_SENTENCE_PATTERN = r'(?<![^.!?])[^.!?]++[.!?]'
+else:
+    LONG_SENTENCE_PATTERN = r'(?<![^.!?])[^.!?]+[.!?]'
+
+# Matches only when a sentence has more than 30 whitespace-separated words,
+# stopping at the 31st instead of splitting the whole sentence into a list
+MAX_SENTENCE_WORDS = 30
+_LONG_SENTENCE = re.compile(r'\s*\S+(?:\s+\S+){%d}' % MAX_SENTENCE_WORDS)
+
+# Default all-caps pattern; texts without a run of three capitals can never
+# match it, which lets the scan skip the rule entirely. The run check is a
+# plain character-class search, much cheaper than the word-boundary scan
+ALL_CAPS_PATTERN = r'\b[A-Z]{3,}\b'
+_CAPS_RUN = re.compile(r'[A-Z]{3}')
+
+# Default bullet pattern, and the plain markers the bullet fast path rewrites
+# with str.replace when they start a line
+BULLET_PATTERN = r'(?:(?<=\n)|^)\s*[-*•+]\s'
+_BULLET_MARKERS = ('- ', '* ', '+ ')
+
+# Replacements for surplus em-dashes, indexed by two random bits
+# (50% chance of keeping the em-dash)
+_EMDASH_CHOICES = (',', '.', '—', '—')
+
+
+def _compile_rule(name: str, pattern: str):
+    """
+    Compile a rule pattern.
+    
+    Sentence-level rules are scanned on their own, so they may use the
+    ``regex`` package when it is installed; token-level rules must stay
+    compatible with ``re`` because they are joined into one pattern.
+    
+    Args:
+        name: Name of the rule.
+        pattern: Regex pattern to compile.
+        
+    Returns:
+        The compiled pattern.
+    """
+    if name in SENTENCE_RULES and _regex is not None:
+        return _regex.compile(pattern)
+    return re.compile(pattern)
+
+
+def _normalize_bullets(text: str) -> Tuple[str, Dict[int, str]]:
+    """
+    Rewrite plain bullet markers at the start of lines to '• '.
+    
+    The markers are the same length as '• ', so every position in the
+    normalized text still lines up with the original text.
+    
+    Args:
+        text: Text to normalize.
+        
+    Returns:
+        Tuple of (normalized_text, original marker by position).
+    """
+    markers = {}
+    for marker in _BULLET_MARKERS:
+        if text.startswith(marker):
+            markers[0] = marker
+            text = '• ' + text[len(marker):]
+        pos = text.find('\n' + marker)
+        if pos == -1:
+            continue
+        while pos != -1:
+            markers[pos + 1] = marker
+            pos = text.find('\n' + marker, pos + 2)
+        text = text.replace('\n' + marker, '\n• ')
+    return text, markers
+
+
+def _iter_rule_matches(name: str, regex: re.Pattern, fix: Callable, text: str) -> Iterator[Tuple[str, Callable, re.Match]]:
+    """
+    Scan the text with a single rule's regex.
+    
+    Args:
+        name: Name of the rule.
+        regex: The rule's compiled pattern.
+        fix: The rule's fix function.
+        text: Text to check.
+        
+    Yields:
+        Tuples of (rule_name, fix_function, match).
+    """
+    for match in regex.finditer(text):
+        yield name, fix, match
 
 
 class FormattingRules:
@@ -14,7 +122,7 @@ class FormattingRules:
         # Default formatting rules
         self.rules = {
             "all_caps": {
-                "pattern": r'\b[A-Z]{3,}\b',
+                "pattern": ALL_CAPS_PATTERN,
                 "description": "Avoid using ALL CAPS words",
                 "fix": self._fix_all_caps
             },
@@ -24,12 +132,12 @@ class FormattingRules:
                 "fix": self._fix_multiple_exclamations
             },
             "inconsistent_bullets": {
-                "pattern": r'(?:(?<=\n)|^)\s*[-*•+]\s',
+                "pattern": BULLET_PATTERN,
                 "description": "Maintain consistent bullet formatting",
                 "fix": self._fix_inconsistent_bullets
             },
             "long_sentences": {
-                "pattern": r'[^.!?]+[.!?]',
+                "pattern": LONG_SENTENCE_PATTERN,
                 "description": "Avoid overly long sentences (>30 words)",
                 "fix": self._fix_long_sentences
             },
@@ -39,10 +147,27 @@ class FormattingRules:
                 "fix": self._fix_excessive_emdashes
             }
         }
+        
+        # Patterns of the built-in rules, so cheap pre-checks and fast paths
+        # are only used while a rule still behaves as built in
+        self._default_patterns = {name: rule["pattern"] for name, rule in self.rules.items()}
+        
+        # Compile each pattern once rather than on every check
+        for name, rule in self.rules.items():
+            rule["regex"] = _compile_rule(name, rule["pattern"])
+    
+    def _is_default_rule(self, rule_name: str) -> bool:
+        """Check whether a rule is built in and still uses its default pattern."""
+        rule = self.rules.get(rule_name)
+        return rule is not None and rule["pattern"] == self._default_patterns.get(rule_name)
     
     def _fix_all_caps(self, text: str, match: re.Match) -> str:
         """Fix ALL CAPS by converting to title case."""
-        return match.group(0).title()
+        word = match.group(0)
+        if word.isascii():
+            # Plain ASCII needs no Unicode title-casing rules
+            return word[:1] + word[1:].lower()
+        return word.title()
     
     def _fix_multiple_exclamations(self, text: str, match: re.Match) -> str:
         """Fix multiple exclamation points by replacing with a single one."""
@@ -52,24 +177,29 @@ class FormattingRules:
         """Standardize bullet points to use '• '."""
         return "• "
     
-    def _fix_excessive_emdashes(self, text: str, match: re.Match) -> str:
+    def _fix_excessive_emdashes(self, text: str, match: re.Match,
+                                total_emdashes: Optional[int] = None,
+                                first_dash_pos: Optional[int] = None) -> str:
         """
         Replace some em-dashes with other punctuation to avoid overuse.
         
         Args:
             text: The full text being processed
             match: The regex match object for the em-dash
+            total_emdashes: Number of em-dashes in the text, if already counted
+            first_dash_pos: Position of the first em-dash, if already known
             
         Returns:
             A replacement string (either keeps the em-dash or replaces it)
         """
-        # Count total em-dashes in the text
-        total_emdashes = text.count('—')
+        # Count total em-dashes in the text unless the caller already did
+        if total_emdashes is None:
+            total_emdashes = text.count('—')
+            first_dash_pos = text.find('—')
         
         # If there are more than 2 em-dashes, replace some with other punctuation
         if total_emdashes > 2:
             # Keep first em-dash, replace others with commas or periods
-            first_dash_pos = text.find('—')
             current_pos = match.start()
             
             if current_pos == first_dash_pos:
@@ -77,36 +207,42 @@ class FormattingRules:
             else:
                 # Randomly choose between comma, period, or keeping the em-dash
                 # This creates natural variation
-                import random
-                replacements = [',', '.', '—', '—']  # 50% chance of keeping
-                return random.choice(replacements)
+                return _EMDASH_CHOICES[getrandbits(2)]
         
         return '—'  # Keep the em-dash if there aren't too many
         
     def _fix_long_sentences(self, text: str, match: re.Match) -> str:
         """Check if sentence is too long and mark it for review."""
-        sentence = match.group(0)
-        word_count = len(sentence.split())
-        if word_count > 30:
-            # Just return the original; we'll flag it in the violations report
-            pass
-        return sentence
+        # Just return the original; long sentences are flagged in the
+        # violations report rather than rewritten
+        return match.group(0)
     
     def add_custom_rule(self, name: str, pattern: str, description: str, fix_function: callable) -> None:
         """
         Add a custom formatting rule.
         
+        Prefer bounded (``{1,200}``) or, on Python 3.11+, possessive
+        (``++``) quantifiers over nested unbounded repetition, which can
+        backtrack catastrophically on hostile input.
+        
         Args:
             name: Name of the rule.
             pattern: Regex pattern to match.
             description: Description of the rule.
             fix_function: Function to fix violations.
+            
+        Raises:
+            re.error: If the pattern does not compile. The rules are left
+                unchanged.
         """
-        self.rules[name] = {
+        rule = {
             "pattern": pattern,
+            "regex": _compile_rule(name, pattern),
             "description": description,
             "fix": fix_function
         }
+        
+        self.rules[name] = rule
     
     def remove_rule(self, rule_name: str) -> bool:
         """
@@ -123,6 +259,61 @@ class FormattingRules:
             return True
         return False
     
+    def _token_scans(self, text: str) -> List[Iterator[Tuple[str, Callable, re.Match]]]:
+        """
+        Start a scan of the text for each token-level rule.
+        
+        Each rule keeps its own precompiled regex, which lets the regex
+        engine use the literal prefix of patterns such as ``!{2,}``. Rules
+        the text cannot possibly trigger are skipped with a cheap pre-check.
+        
+        Args:
+            text: Text to check.
+            
+        Returns:
+            List of match iterators, one per rule, in rule order.
+        """
+        skip_caps = self._is_default_rule("all_caps") and not _CAPS_RUN.search(text)
+        return [
+            _iter_rule_matches(name, rule["regex"], rule["fix"], text)
+            for name, rule in self.rules.items()
+            if name not in SENTENCE_RULES and not (skip_caps and name == "all_caps")
+        ]
+    
+    def _iter_sentence_matches(self, text: str) -> Iterator[Tuple[str, Callable, re.Match]]:
+        """
+        Find the sentence-level violations in the text.
+        
+        Args:
+            text: Text to check.
+            
+        Yields:
+            Tuples of (rule_name, fix_function, match).
+        """
+        # Special case for long sentences
+        if "long_sentences" in self.rules:
+            rule = self.rules["long_sentences"]
+            for match in rule["regex"].finditer(text):
+                if _LONG_SENTENCE.match(match.group(0)):
+                    yield "long_sentences", rule["fix"], match
+    
+    def _iter_all_matches(self, text: str) -> Iterator[Tuple[str, Callable, re.Match]]:
+        """
+        Find every violation in the text.
+        
+        Token-level matches come first, in text order, merged from the
+        per-rule scans. They may overlap when a custom rule matches the same
+        text as another rule. Sentence-level matches follow.
+        
+        Args:
+            text: Text to check.
+            
+        Yields:
+            Tuples of (rule_name, fix_function, match).
+        """
+        yield from heapq.merge(*self._token_scans(text), key=lambda item: item[2].start())
+        yield from self._iter_sentence_matches(text)
+    
     def check_violations(self, text: str) -> Dict[str, List[str]]:
         """
         Check for formatting violations.
@@ -135,85 +326,116 @@ class FormattingRules:
         """
         violations = {}
         
-        for rule_name, rule in self.rules.items():
-            matches = list(re.finditer(rule["pattern"], text))
-            if matches:
-                violations[rule_name] = [
-                    {
-                        "text": match.group(0),
-                        "start": match.start(),
-                        "end": match.end()
-                    }
-                    for match in matches
-                ]
-                
-                # Special case for long sentences
-                if rule_name == "long_sentences":
-                    violations[rule_name] = [
-                        v for v in violations[rule_name] 
-                        if len(v["text"].split()) > 30
-                    ]
-                    if not violations[rule_name]:
-                        del violations[rule_name]
+        # The report is grouped by rule, so the scans need no merging
+        scans = self._token_scans(text) + [self._iter_sentence_matches(text)]
+        for rule_name, _, match in chain.from_iterable(scans):
+            violations.setdefault(rule_name, []).append({
+                "text": match.group(0),
+                "start": match.start(),
+                "end": match.end()
+            })
         
         return violations
     
-    def fix_violations(self, text: str) -> Tuple[str, Dict[str, Any]]:
+    def fix_violations(self, text: str, fast_path: bool = False) -> Tuple[str, Dict[str, Any]]:
         """
         Fix formatting violations.
         
         Args:
             text: Text to fix.
+            fast_path: Normalize plain '- ', '* ' and '+ ' bullets at the very
+                start of a line with string replacement first. The bullet
+                regex still reports every bullet and fixes the rest, such as
+                indented or tab-separated bullets, so the result and report
+                match the default path. Only used while the bullet rule keeps
+                its built-in pattern and fix.
             
         Returns:
             Tuple of (fixed_text, report).
         """
-        original_text = text
-        violations = self.check_violations(text)
         fixes_applied = {}
+        rules_triggered = {}
+        violations_found = 0
+        normalized = {}
         
-        # Apply fixes in reverse order of appearance to avoid offset issues
-        all_matches = []
-        for rule_name, rule_violations in violations.items():
-            for violation in rule_violations:
-                all_matches.append((
-                    rule_name,
-                    violation["start"],
-                    violation["end"],
-                    violation["text"]
-                ))
-        
-        # Sort by start position in descending order
-        all_matches.sort(key=lambda x: x[1], reverse=True)
-        
-        # Apply fixes
-        for rule_name, start, end, original in all_matches:
-            rule = self.rules[rule_name]
-            # Create a match object (this is a bit hacky but works for our purpose)
-            match = re.match(rule["pattern"], original)
-            if not match:
-                # If we can't recreate the match object, use the original text
-                match = type('obj', (object,), {'group': lambda self, *args: original})()
-            
-            # Apply the fix
-            fixed_text = rule["fix"](text, match)
-            
-            # Replace the text
-            text = text[:start] + fixed_text + text[end:]
+        if (fast_path and self._is_default_rule("inconsistent_bullets")
+                and self.rules["inconsistent_bullets"]["fix"] == self._fix_inconsistent_bullets):
+            text, normalized = _normalize_bullets(text)
+        
+        # Count em-dashes once for this call rather than once per dash; the
+        # counts are bound per call so a shared instance stays thread-safe
+        emdash_fix = self._fix_excessive_emdashes
+        counted_emdash_fix = partial(
+            emdash_fix,
+            total_emdashes=text.count('—'),
+            first_dash_pos=text.find('—')
+        )
+        
+        # Report and rewrite every violation in a single scan, joining the
+        # untouched spans and the fixes once at the end
+        pieces = []
+        last_end = 0
+        for rule_name, fix, match in self._iter_all_matches(text):
+            violations_found += 1
+            rules_triggered[rule_name] = None
+            if rule_name in SENTENCE_RULES:
+                # Sentence-level rules only flag text for review
+                fixes_applied.setdefault(rule_name, []).append({
+                    "original": match.group(0),
+                    "fixed": match.group(0)
+                })
+                continue
+            if match.start() < last_end:
+                # Overlaps text another rule already rewrote; it is
+                # reported but left as that rule fixed it
+                continue
+            if fix == emdash_fix:
+                fix = counted_emdash_fix
             
-            # Record the fix
-            if rule_name not in fixes_applied:
-                fixes_applied[rule_name] = []
-            fixes_applied[rule_name].append({
-                "original": original,
-                "fixed": fixed_text
-            })
+            pieces.append(text[last_end:match.start()])
+            marker = normalized.get(match.end() - 2) if rule_name == "inconsistent_bullets" else None
+            if marker is not None:
+                # Already rewritten by the fast path; report the bullet as
+                # the default path would have seen it
+                fixes_applied.setdefault(rule_name, []).append({
+                    "original": match.group(0)[:-2] + marker,
+                    "fixed": "• "
+                })
+                pieces.append("• ")
+            else:
+                pieces.append(self._dispatch(match, rule_name, fix, fixes_applied))
+            last_end = match.end()
+        
+        pieces.append(text[last_end:])
         
         # Prepare the report
         report = {
-            "violations_found": len(all_matches),
+            "violations_found": violations_found,
             "fixes_applied": fixes_applied,
-            "rules_triggered": list(violations.keys())
+            "rules_triggered": list(rules_triggered)
         }
         
-        return text, report
+        return "".join(pieces), report
+    
+    def _dispatch(self, match: re.Match, rule_name: str, fix: Callable,
+                  fixes_applied: Dict[str, List[Dict[str, str]]]) -> str:
+        """
+        Apply the fix for a single match of the combined pattern.
+        
+        Args:
+            match: Match from the combined pattern.
+            rule_name: Name of the rule the match belongs to.
+            fix: The rule's fix function.
+            fixes_applied: Report of fixes, updated in place.
+            
+        Returns:
+            The replacement text for the match.
+        """
+        original = match.group(0)
+        fixed = fix(match.string, match)
+        
+        fixes_applied.setdefault(rule_name, []).append({
+            "original": original,
+            "fixed": fixed
+        })
+        return fixed
@@ -2,14 +2,73 @@
 Core tone conversion functionality for BrandTone.
 """
 
-from typing import Dict, Any, List, Tuple
-from utils import call_openai
+import asyncio
+import re
+from typing import Dict, Any, List, Optional, Tuple
+from utils import call_openai, call_openai_async, create_async_client, parse_json
+
+# Outermost JSON object in a QA response, ignoring any ```json fences or
+# commentary the model wraps around it
+_JSON_BLOCK = re.compile(r'\{.*\}', re.DOTALL)
+
+def _render_characteristics(characteristics: List[str]) -> str:
+    """Render tone characteristics as the bulleted block used in prompts."""
+    return "\n".join(["- " + char for char in characteristics])
 
 class ToneConverter:
     """
     Converts text to match specified brand tones.
     """
     
+    # Prompt templates, filled in with str.format for each request
+    _CONVERT_TEMPLATE = """
+        Rewrite the following marketing text to match a {tone_name} tone. 
+
+        Tone characteristics:
+        {description}
+        
+        Specific style elements to incorporate:
+        {char_block}
+        
+        Example of the target tone:
+        "{example}"
+        
+        Follow these additional formatting rules:
+        1. Do not use ALL CAPS for emphasis
+        2. Use at most one exclamation point per paragraph (except for genz tone)
+        3. Keep bullet points consistent using the • symbol
+        4. Aim for sentences with 20 words or fewer (can be more flexible with genz tone)
+        
+        Original text:
+        "{text}"
+        
+        Rewritten text in {tone_name} tone:
+        """
+    
+    _QA_TEMPLATE = """
+        Analyze the following text that was rewritten to match a {tone_name} tone.
+        
+        Tone characteristics:
+        {description}
+        
+        Expected style elements:
+        {char_block}
+        
+        Text to analyze:
+        "{text}"
+        
+        Please provide an analysis in JSON format with the following structure:
+        {{
+            "tone_accuracy": "Score from 1-10",
+            "grammar_correctness": "Score from 1-10",
+            "strengths": ["List of what works well"],
+            "improvement_areas": ["List of suggestions for improvement"],
+            "forbidden_elements_found": ["List any ALL CAPS, multiple exclamation points, or inconsistent formatting found"]
+        }}
+        
+        Return ONLY the JSON object, nothing else.
+        """
+    
     def __init__(self):
         """Initialize the tone converter with predefined tone profiles."""
         # Define tone profiles with characteristics and examples
@@ -72,15 +131,24 @@ class ToneConverter:
                 "example": "okay so this new drop is actually fire 🔥 ngl we went all out on this one. it's giving major main character energy fr. tap in before it's gone!!"
             }
         }
+        
+        # Render each tone's characteristics list once for the prompts
+        self._char_blocks = {
+            name: _render_characteristics(profile["characteristics"])
+            for name, profile in self.tone_profiles.items()
+        }
+        
+        # Tone names are requested on every render, so keep them ready
+        self._available_tones = tuple(self.tone_profiles)
     
-    def get_available_tones(self) -> List[str]:
+    def get_available_tones(self) -> Tuple[str, ...]:
         """
-        Get the list of available tone profiles.
+        Get the available tone profiles.
         
         Returns:
-            List of available tone names.
+            Tuple of available tone names.
         """
-        return list(self.tone_profiles.keys())
+        return self._available_tones
     
     def get_tone_details(self, tone_name: str) -> Dict[str, Any]:
         """
@@ -94,13 +162,17 @@ class ToneConverter:
         """
         return self.tone_profiles.get(tone_name, {})
     
-    def convert_text(self, text: str, target_tone: str) -> Tuple[str, Dict[str, Any]]:
+    def convert_text(self, text: str, target_tone: str,
+                     use_cache: Optional[bool] = None) -> Tuple[str, Dict[str, Any]]:
         """
         Convert text to match a target tone.
         
         Args:
             text: The text to convert.
             target_tone: The target tone profile name.
+            use_cache: Whether to reuse cached API responses, e.g. across
+                Streamlit reruns. Defaults to caching only deterministic
+                (temperature 0) requests.
             
         Returns:
             Tuple of (converted_text, metadata).
@@ -115,60 +187,129 @@ class ToneConverter:
         prompt = self._create_tone_conversion_prompt(text, target_tone, tone_profile)
         
         # Call OpenAI API
-        converted_text = call_openai(prompt)
+        converted_text = call_openai(prompt, use_cache=use_cache)
         
         # Create metadata
-        metadata = {
-            "original_text": text,
-            "target_tone": target_tone,
-            "tone_description": tone_profile["description"],
-            "characteristics_applied": tone_profile["characteristics"]
-        }
+        metadata = self._create_metadata(text, target_tone, tone_profile)
         
         # Optionally run a QA check
-        qa_result = self._run_qa_check(converted_text, target_tone, tone_profile)
+        qa_result = self._run_qa_check(converted_text, target_tone, tone_profile, use_cache)
         metadata["qa_check"] = qa_result
         
         return converted_text, metadata
     
-    def _create_tone_conversion_prompt(self, text: str, tone_name: str, tone_profile: Dict[str, Any]) -> str:
+    async def convert_text_async(self, text: str, target_tone: str, client: Any = None,
+                                 use_cache: Optional[bool] = None) -> Tuple[str, Dict[str, Any]]:
         """
-        Create a prompt for the OpenAI API to convert text to a target tone.
+        Convert text to match a target tone without blocking the event loop.
         
         Args:
             text: The text to convert.
-            tone_name: The name of the target tone.
-            tone_profile: The tone profile details.
+            target_tone: The target tone profile name.
+            client: Async OpenAI client to use. If None, one is created and
+                closed for this conversion.
+            use_cache: Whether to reuse cached API responses, e.g. across
+                Streamlit reruns. Defaults to caching only deterministic
+                (temperature 0) requests.
             
         Returns:
-            Prompt for the OpenAI API.
+            Tuple of (converted_text, metadata).
         """
-        prompt = f"""
-        Rewrite the following marketing text to match a {tone_name} tone. 
-
-        Tone characteristics:
-        {tone_profile['description']}
+        if target_tone not in self.tone_profiles:
+            return text, {"error": f"Tone profile '{target_tone}' not found"}
         
-        Specific style elements to incorporate:
-        {chr(10).join('- ' + char for char in tone_profile['characteristics'])}
+        if client is None:
+            async with create_async_client() as client:
+                return await self.convert_text_async(text, target_tone, client, use_cache)
         
-        Example of the target tone:
-        "{tone_profile['example']}"
+        tone_profile = self.tone_profiles[target_tone]
+        prompt = self._create_tone_conversion_prompt(text, target_tone, tone_profile)
+        converted_text = await call_openai_async(prompt, use_cache=use_cache, client=client)
         
-        Follow these additional formatting rules:
-        1. Do not use ALL CAPS for emphasis
-        2. Use at most one exclamation point per paragraph (except for genz tone)
-        3. Keep bullet points consistent using the • symbol
-        4. Aim for sentences with 20 words or fewer (can be more flexible with genz tone)
+        metadata = self._create_metadata(text, target_tone, tone_profile)
+        metadata["qa_check"] = await self._run_qa_check_async(
+            converted_text, target_tone, tone_profile, client, use_cache
+        )
         
-        Original text:
-        "{text}"
+        return converted_text, metadata
+    
+    async def convert_batch_async(self, texts: List[str], target_tone: str,
+                                  max_concurrency: int = 5,
+                                  use_cache: Optional[bool] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Convert several texts concurrently, overlapping their API round-trips.
         
-        Rewritten text in {tone_name} tone:
+        The batch gets its own client, so it is safe to run each batch with a
+        separate ``asyncio.run``. Each conversion makes its two requests in
+        turn, so at most ``max_concurrency`` requests are in flight at once.
+        
+        Args:
+            texts: The texts to convert.
+            target_tone: The target tone profile name.
+            max_concurrency: Maximum number of conversions running at once.
+            use_cache: Whether to reuse cached API responses, e.g. across
+                Streamlit reruns. Defaults to caching only deterministic
+                (temperature 0) requests.
+            
+        Returns:
+            List of (converted_text, metadata) tuples, in the order of texts.
+            
+        Raises:
+            ValueError: If max_concurrency is less than 1.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async with create_async_client() as client:
+            async def convert(text: str) -> Tuple[str, Dict[str, Any]]:
+                async with semaphore:
+                    return await self.convert_text_async(text, target_tone, client, use_cache)
+            
+            return list(await asyncio.gather(*(convert(text) for text in texts)))
+    
+    def _create_metadata(self, text: str, target_tone: str, tone_profile: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create the metadata describing a conversion.
+        
+        Args:
+            text: The original text.
+            target_tone: The target tone profile name.
+            tone_profile: The tone profile details.
+            
+        Returns:
+            Metadata dictionary.
+        """
+        return {
+            "original_text": text,
+            "target_tone": target_tone,
+            "tone_description": tone_profile["description"],
+            "characteristics_applied": tone_profile["characteristics"]
+        }
+    
+    def _create_tone_conversion_prompt(self, text: str, tone_name: str, tone_profile: Dict[str, Any]) -> str:
+        """
+        Create a prompt for the OpenAI API to convert text to a target tone.
+        
+        Args:
+            text: The text to convert.
+            tone_name: The name of the target tone.
+            tone_profile: The tone profile details.
+            
+        Returns:
+            Prompt for the OpenAI API.
         """
-        return prompt
+        return self._CONVERT_TEMPLATE.format(
+            tone_name=tone_name,
+            description=tone_profile['description'],
+            char_block=self._char_blocks[tone_name],
+            example=tone_profile['example'],
+            text=text
+        )
     
-    def _run_qa_check(self, text: str, tone_name: str, tone_profile: Dict[str, Any]) -> Dict[str, Any]:
+    def _run_qa_check(self, text: str, tone_name: str, tone_profile: Dict[str, Any],
+                      use_cache: Optional[bool] = None) -> Dict[str, Any]:
         """
         Run a QA check on the converted text.
         
@@ -176,42 +317,74 @@ class ToneConverter:
             text: The converted text.
             tone_name: The name of the target tone.
             tone_profile: The tone profile details.
+            use_cache: Whether to reuse a cached API response.
             
         Returns:
             QA check results.
         """
-        prompt = f"""
-        Analyze the following text that was rewritten to match a {tone_name} tone.
-        
-        Tone characteristics:
-        {tone_profile['description']}
-        
-        Expected style elements:
-        {chr(10).join('- ' + char for char in tone_profile['characteristics'])}
+        prompt = self._create_qa_prompt(text, tone_name, tone_profile)
         
-        Text to analyze:
-        "{text}"
+        # Call OpenAI API
+        qa_response = call_openai(prompt, use_cache=use_cache)
         
-        Please provide an analysis in JSON format with the following structure:
-        {{
-            "tone_accuracy": "Score from 1-10",
-            "grammar_correctness": "Score from 1-10",
-            "strengths": ["List of what works well"],
-            "improvement_areas": ["List of suggestions for improvement"],
-            "forbidden_elements_found": ["List any ALL CAPS, multiple exclamation points, or inconsistent formatting found"]
-        }}
+        return self._parse_qa_response(qa_response)
+    
+    async def _run_qa_check_async(self, text: str, tone_name: str, tone_profile: Dict[str, Any],
+                                  client: Any, use_cache: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Run a QA check on the converted text without blocking the event loop.
         
-        Return ONLY the JSON object, nothing else.
+        Args:
+            text: The converted text.
+            tone_name: The name of the target tone.
+            tone_profile: The tone profile details.
+            client: Async OpenAI client to use.
+            use_cache: Whether to reuse a cached API response.
+            
+        Returns:
+            QA check results.
+        """
+        prompt = self._create_qa_prompt(text, tone_name, tone_profile)
+        qa_response = await call_openai_async(prompt, use_cache=use_cache, client=client)
+        return self._parse_qa_response(qa_response)
+    
+    def _create_qa_prompt(self, text: str, tone_name: str, tone_profile: Dict[str, Any]) -> str:
         """
+        Create a prompt for the OpenAI API to QA converted text.
         
-        # Call OpenAI API
-        qa_response = call_openai(prompt)
+        Args:
+            text: The converted text.
+            tone_name: The name of the target tone.
+            tone_profile: The tone profile details.
+            
+        Returns:
+            Prompt for the OpenAI API.
+        """
+        return self._QA_TEMPLATE.format(
+            tone_name=tone_name,
+            description=tone_profile['description'],
+            char_block=self._char_blocks[tone_name],
+            text=text
+        )
+    
+    def _parse_qa_response(self, qa_response: str) -> Dict[str, Any]:
+        """
+        Parse the JSON returned by a QA check.
         
+        Args:
+            qa_response: The raw QA response.
+            
+        Returns:
+            QA check results, or the raw response if it is not valid JSON.
+        """
         # Try to parse the JSON response
+        match = _JSON_BLOCK.search(qa_response)
+        if match is None:
+            return {"raw_response": qa_response}
+        
         try:
-            import json
-            qa_result = json.loads(qa_response)
-        except:
+            qa_result = parse_json(match.group(0))
+        except ValueError:
             # If JSON parsing fails, return the raw response
             qa_result = {"raw_response": qa_response}
         
@@ -238,4 +411,6 @@ class ToneConverter:
             "characteristics": characteristics,
             "example": example
         }
+        self._char_blocks[name] = _render_characteristics(characteristics)
+        self._available_tones = tuple(self.tone_profiles)
         return True
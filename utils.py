@@ -3,48 +3,267 @@ Utility functions for the BrandTone application.
 """
 import os
 import json
-from typing import Dict, Any, Optional
+import hashlib
+import secrets
+import stat
+from typing import Callable, Dict, Any, Optional
 from pathlib import Path
-from dotenv import load_dotenv
-import openai
 
-# Load environment variables
-load_dotenv()
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+try:
+    from diskcache import Cache
+except ImportError:  # Responses are not cached without diskcache
+    Cache = None
+
+# OpenAI client, created on first use so importing this module stays cheap
+_client = None
+
+def _load_api_key() -> Optional[str]:
+    """Load environment variables and return the OpenAI API key."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return os.getenv("OPENAI_API_KEY")
+
+def _get_client():
+    """Return the OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(api_key=_load_api_key())
+    return _client
+
+def create_async_client():
+    """
+    Create a new async OpenAI client.
+    
+    Async clients pool their connections on the event loop that first uses
+    them, so each ``asyncio.run`` needs its own client rather than a shared
+    one. Use it as ``async with create_async_client() as client:``.
+    
+    Returns:
+        An ``openai.AsyncOpenAI`` client.
+    """
+    import openai
+    return openai.AsyncOpenAI(api_key=_load_api_key())
+
+SYSTEM_PROMPT = "You are a professional writer specializing in brand voice adaptation."
+
+# Directory holding cached OpenAI responses
+CACHE_DIR = ".brandtone_cache"
+_cache = None
+
+def _get_cache():
+    """Return the response cache, opening it on first use, or None if unavailable."""
+    global _cache
+    if _cache is None and Cache is not None:
+        try:
+            _cache = Cache(CACHE_DIR)
+        except Exception:
+            # e.g. a read-only working directory or a corrupt database
+            return None
+    return _cache
+
+def _cache_get(cache, key: str) -> Optional[str]:
+    """Look up a cached response, treating cache errors as a miss."""
+    try:
+        return cache.get(key)
+    except Exception:
+        return None
+
+def _cache_set(cache, key: str, value: str) -> None:
+    """Store a response in the cache, ignoring cache errors."""
+    try:
+        cache[key] = value
+    except Exception:
+        pass
+
+def _cache_key(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+    """Build the cache key for a request."""
+    return hashlib.blake2b(
+        f"{model}|{temperature}|{max_tokens}|{prompt}".encode("utf-8")
+    ).hexdigest()
+
+def _response_cache(use_cache: Optional[bool], temperature: float):
+    """
+    Return the cache to use for a request, or None to skip caching.
+    
+    Sampled responses are meant to vary, so by default only deterministic
+    (temperature 0) requests are cached.
+    """
+    if use_cache is None:
+        use_cache = temperature == 0
+    return _get_cache() if use_cache else None
 
 def call_openai(
     prompt: str, 
     model: str = "gpt-4o", 
     temperature: float = 0.7,
-    max_tokens: int = 1000
+    max_tokens: int = 1000,
+    on_token: Optional[Callable[[str], None]] = None,
+    use_cache: Optional[bool] = None
 ) -> str:
     """
     Call OpenAI API with a prompt and return the response.
     
+    The response is streamed, so callers can render it as it arrives.
+    
     Args:
         prompt: The prompt to send to OpenAI.
         model: The model to use.
         temperature: The sampling temperature.
         max_tokens: The maximum number of tokens to generate.
+        on_token: Optional callback invoked with each chunk of generated text.
+        use_cache: Whether to reuse cached responses. Defaults to caching
+            only when temperature is 0.
         
     Returns:
         The generated text.
     """
+    cache = _response_cache(use_cache, temperature)
+    if cache is not None:
+        key = _cache_key(prompt, model, temperature, max_tokens)
+        cached = _cache_get(cache, key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            return cached
+    
     try:
-        response = client.chat.completions.create(
+        response = _get_client().chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a professional writer specializing in brand voice adaptation."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            stream=True
         )
-        return response.choices[0].message.content.strip()
+        
+        parts = []
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                parts.append(token)
+                if on_token is not None:
+                    on_token(token)
+        result = "".join(parts).strip()
+    except Exception as e:
+        return f"Error calling OpenAI API: {str(e)}"
+    
+    if cache is not None:
+        _cache_set(cache, key, result)
+    return result
+
+async def call_openai_async(
+    prompt: str, 
+    model: str = "gpt-4o", 
+    temperature: float = 0.7,
+    max_tokens: int = 1000,
+    use_cache: Optional[bool] = None,
+    client: Any = None
+) -> str:
+    """
+    Call OpenAI API asynchronously so several requests can be in flight at once.
+    
+    Args:
+        prompt: The prompt to send to OpenAI.
+        model: The model to use.
+        temperature: The sampling temperature.
+        max_tokens: The maximum number of tokens to generate.
+        use_cache: Whether to reuse cached responses. Defaults to caching
+            only when temperature is 0.
+        client: Async client from ``create_async_client`` to send the request
+            with. If None, a client is created and closed for this call.
+        
+    Returns:
+        The generated text.
+    """
+    cache = _response_cache(use_cache, temperature)
+    if cache is not None:
+        key = _cache_key(prompt, model, temperature, max_tokens)
+        cached = _cache_get(cache, key)
+        if cached is not None:
+            return cached
+    
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    try:
+        if client is None:
+            async with create_async_client() as own_client:
+                response = await own_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+        else:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        result = response.choices[0].message.content.strip()
     except Exception as e:
         return f"Error calling OpenAI API: {str(e)}"
+    
+    if cache is not None:
+        _cache_set(cache, key, result)
+    return result
+
+def parse_json(data: str) -> Any:
+    """
+    Parse a JSON string, using orjson when it is installed.
+    
+    Args:
+        data: The JSON string to parse.
+        
+    Returns:
+        The parsed value.
+        
+    Raises:
+        ValueError: If the string is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """
+    Write bytes to a file in one call, replacing it atomically.
+    
+    The data goes to a temporary file in the same directory first, so a crash
+    never leaves a half-written result behind. Symlinks are written through,
+    an existing file keeps its permissions, and a new file gets the usual
+    umask-based permissions.
+    
+    Args:
+        path: The file to write.
+        data: The bytes to write.
+    """
+    target = Path(os.path.realpath(path))
+    tmp_path = target.with_name(f".{target.name}.{secrets.token_hex(8)}.tmp")
+    
+    # Mode 0o666 is reduced by the process umask, like open(path, 'wb')
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        if target.exists():
+            os.chmod(tmp_path, stat.S_IMODE(target.stat().st_mode))
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 def save_result(content: str, format_type: str = "txt", file_path: Optional[str] = None) -> Dict[str, Any]:
     """
@@ -68,12 +287,14 @@ def save_result(content: str, format_type: str = "txt", file_path: Optional[str]
         path = Path(file_path)
         
         if format_type.lower() == "json":
-            with open(path, 'w') as f:
-                json.dump({"content": content}, f, indent=2)
+            if orjson is not None:
+                data = orjson.dumps({"content": content}, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps({"content": content}, indent=2, ensure_ascii=False).encode("utf-8")
         else:
-            with open(path, 'w') as f:
-                f.write(content)
-                
+            data = content.encode("utf-8")
+        
+        _write_atomic(path, data)
         return {"status": "success", "file_path": str(path.absolute())}
     except Exception as e:
         return {"status": "error", "message": str(e)}